@@ -1,10 +1,26 @@
-import spotipy
+from __future__ import annotations
+
 import datetime
 import time
 import json
 import logging
-from spotipy.oauth2 import SpotifyOAuth, CacheFileHandler
-from typing import Dict
+import math
+import mmap
+import os
+import random
+import re
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import spotipy
+    from spotipy.oauth2 import SpotifyOAuth
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    def json_loads(data):
+        return json.loads(bytes(data))
 
 # Configure logging
 logging.basicConfig(
@@ -15,15 +31,35 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 CONFIG_FILE = 'config.json'
-TOKEN_CONFIG_KEYS = {'username', 'client_id', 'client_secret', 'redirect_uri'}
+TOKEN_CONFIG_KEYS = ('username', 'client_id', 'client_secret', 'redirect_uri')
 SPOTIFY_SCOPE = 'user-read-playback-state user-modify-playback-state'
+MAX_SLEEP_CHUNK_SECONDS = 60
+SPIN_WINDOW_SECONDS = 0.005
+RETRY_BASE_DELAY_SECONDS = 0.5
+RETRY_MAX_DELAY_SECONDS = 30
+NON_RETRYABLE_STATUSES = frozenset({401, 403, 404})
+TIME_PATTERN = re.compile(r'([01]?\d|2[0-3]):([0-5]\d)')
+
+_config_cache: Optional[Tuple[Tuple[str, int, int], Dict]] = None
 
 
 def load_config(config_file: str = CONFIG_FILE) -> Dict:
-    """Load configuration from a JSON file."""
+    """Load configuration from a JSON file, reusing the last parse if unchanged."""
+    global _config_cache
     try:
-        with open(config_file, 'r') as f:
-            return json.load(f)
+        st = os.stat(config_file)
+        key = (config_file, st.st_mtime_ns, st.st_size)
+        if _config_cache is not None and _config_cache[0] == key:
+            return _config_cache[1]
+        if st.st_size:
+            with open(config_file, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                    memoryview(mm) as buf:
+                config = json_loads(buf)
+        else:
+            config = json_loads(b'')
+        _config_cache = (key, config)
+        return config
     except FileNotFoundError:
         logger.error("Configuration file '%s' not found", config_file)
         raise
@@ -34,8 +70,9 @@ def load_config(config_file: str = CONFIG_FILE) -> Dict:
 
 def get_token_config(config: Dict) -> Dict:
     """Extract and validate token configuration from the config dictionary."""
-    token_config = {k: config.get(k) for k in TOKEN_CONFIG_KEYS}
-    missing_keys = [k for k in TOKEN_CONFIG_KEYS if not token_config[k]]
+    values = tuple(map(config.get, TOKEN_CONFIG_KEYS))
+    token_config = dict(zip(TOKEN_CONFIG_KEYS, values))
+    missing_keys = [k for k, v in zip(TOKEN_CONFIG_KEYS, values) if not v]
     if missing_keys:
         logger.error("Missing required config keys: %s",
                      ', '.join(missing_keys))
@@ -47,6 +84,8 @@ def get_token_config(config: Dict) -> Dict:
 
 def get_spotify_auth_manager(token_config: Dict) -> SpotifyOAuth:
     """Create and return a configured SpotifyOAuth instance."""
+    from spotipy.oauth2 import SpotifyOAuth, CacheFileHandler
+
     cache_handler = CacheFileHandler(username=token_config['username'])
     return SpotifyOAuth(
         client_id=token_config['client_id'],
@@ -59,6 +98,8 @@ def get_spotify_auth_manager(token_config: Dict) -> SpotifyOAuth:
 
 def select_device(sp: spotipy.Spotify, config: Dict) -> Dict:
     """Select a Spotify device based on config or user input."""
+    import spotipy
+
     try:
         devices = sp.devices()['devices']
         if not devices:
@@ -73,32 +114,30 @@ def select_device(sp: spotipy.Spotify, config: Dict) -> Dict:
 
     device_name = config.get('device_name')
     if device_name:
-        return next((d for d in devices if d['name'] == device_name), devices[0])
+        # Reversed so the first device with a given name wins
+        devices_by_name = {d['name']: d for d in reversed(devices)}
+        return devices_by_name.get(device_name, devices[0])
 
     logger.info("Multiple devices found. Available options:")
-    for i, device in enumerate(devices, 1):
-        print(f"{i}. {device['name']} (ID: {device['id']})")
+    print('\n'.join(f"{i}. {device['name']} (ID: {device['id']})"
+                    for i, device in enumerate(devices, 1)))
 
+    choices = {str(i): device for i, device in enumerate(devices, 1)}
     while True:
-        try:
-            choice = int(input("Enter the device index: ")) - 1
-            if 0 <= choice < len(devices):
-                return devices[choice]
-            logger.warning("Invalid selection. Try again.")
-        except ValueError:
-            logger.warning("Please enter a valid number.")
+        choice = input("Enter the device index: ").strip()
+        if choice in choices:
+            return choices[choice]
+        logger.warning("Invalid selection. Enter a number from 1 to %d.",
+                       len(devices))
 
 
 def parse_target_time(time_str: str) -> datetime.time:
     """Parse HH:MM time string into datetime.time."""
-    try:
-        hour, minute = map(int, time_str.split(':'))
-        if 0 <= hour < 24 and 0 <= minute < 60:
-            return datetime.time(hour, minute)
-        raise ValueError("Time out of range")
-    except ValueError as e:
-        logger.error("Invalid time format '%s': %s. Use HH:MM.", time_str, e)
-        raise
+    match = TIME_PATTERN.fullmatch(time_str.strip())
+    if not match:
+        logger.error("Invalid time format '%s'. Use HH:MM.", time_str)
+        raise ValueError("Invalid time format")
+    return datetime.time(int(match[1]), int(match[2]))
 
 
 def get_target_time(config: Dict) -> datetime.time:
@@ -108,42 +147,84 @@ def get_target_time(config: Dict) -> datetime.time:
     return parse_target_time(time_str)
 
 
-def wait_until_target_time(target_time: datetime.time) -> None:
-    """Wait until the specified target time."""
+def get_target_timestamp(target_time: datetime.time) -> float:
+    """Return the POSIX timestamp of the next occurrence of target_time."""
     now = datetime.datetime.now()
     target = datetime.datetime.combine(now.date(), target_time)
     if target <= now:
         target += datetime.timedelta(days=1)
+    return target.timestamp()
+
 
-    wait_seconds = (target - now).total_seconds()
-    if wait_seconds > 0:
-        logger.info("Waiting until %s", target)
-        time.sleep(wait_seconds)
+def wait_until(deadline: float) -> None:
+    """Wait until the given POSIX timestamp.
+
+    Sleeps in coarse chunks, then spin-polls the final few milliseconds so
+    the alarm fires close to the exact deadline. Each chunk re-reads the
+    wall clock, so clock steps and system suspend are picked up within a
+    chunk.
+    """
+    while (remaining := deadline - time.time()) > SPIN_WINDOW_SECONDS:
+        time.sleep(min(remaining - SPIN_WINDOW_SECONDS, MAX_SLEEP_CHUNK_SECONDS))
+    while time.time() < deadline:
+        pass
+
+
+def wait_until_target_time(target_time: datetime.time) -> None:
+    """Wait until the specified target time."""
+    deadline = get_target_timestamp(target_time)
+    logger.info("Waiting until %s", datetime.datetime.fromtimestamp(deadline))
+    wait_until(deadline)
+
+
+def get_retry_delay(error: spotipy.SpotifyException, attempt: int) -> float:
+    """Return the delay before the next retry, honouring Retry-After if present."""
+    retry_after = (getattr(error, 'headers', None) or {}).get('Retry-After')
+    if retry_after:
+        try:
+            retry_after = float(retry_after)
+        except ValueError:
+            retry_after = None
+        if (retry_after is not None and math.isfinite(retry_after)
+                and retry_after >= 0):
+            return min(retry_after, RETRY_MAX_DELAY_SECONDS)
+    delay = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** attempt)
+    return delay + random.uniform(0, 0.25)
 
 
 def start_playback(sp: spotipy.Spotify, device_id: str, max_retries: int = 3) -> None:
     """Start playback on the specified device with retries."""
+    import spotipy
+
     for attempt in range(max_retries):
         try:
             sp.start_playback(device_id=device_id)
             logger.info("Playback started on device %s", device_id)
             return
         except spotipy.SpotifyException as e:
+            if e.http_status in NON_RETRYABLE_STATUSES:
+                logger.error("Playback rejected: %s", e)
+                raise ValueError("Playback failed")
             if attempt == max_retries - 1:
                 logger.error("Max retries reached: %s", e)
                 raise ValueError("Playback failed")
             logger.error("Attempt %d failed: %s", attempt + 1, e)
-            time.sleep(5)
+            time.sleep(get_retry_delay(e, attempt))
 
 
 def main():
     """Main execution loop for Spotify playback scheduling."""
+    sp = None
     while True:
         try:
             config = load_config()
-            auth_manager = get_spotify_auth_manager(get_token_config(config))
+            if sp is None:
+                auth_manager = get_spotify_auth_manager(get_token_config(config))
+                # Complete any interactive login before the long wait
+                auth_manager.get_access_token(as_dict=False)
+                import spotipy
+                sp = spotipy.Spotify(auth_manager=auth_manager)
             wait_until_target_time(get_target_time(config))
-            sp = spotipy.Spotify(auth_manager.get_access_token(as_dict=False))
             start_playback(sp, select_device(sp, config)['id'])
         except KeyboardInterrupt:
             logger.info("Stopped by user")